@@ -1 +1,2 @@
 from gt_converter.convert_coco import CocoConverter
+from gt_converter.coco_index import CocoIndexReader
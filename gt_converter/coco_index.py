@@ -0,0 +1,144 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+
+import json
+import mmap
+from collections import defaultdict
+
+INDEX_SUFFIX = ".index.json"
+
+
+def write_coco_json(f, coco_json, index_path=None):
+    """
+    Write a COCO dict with the same layout as json.dump. If index_path is given, a sidecar index
+    is written that maps each image id to the byte offset and length of its image record and
+    annotation records, and each category id to the ids of the images it appears in.
+    :param f: Text file object opened for writing, positioned at the start of the file
+    :param coco_json: COCO dict with `images` and `annotations` lists
+    :param index_path: Path to write the sidecar index, or None to skip it
+    """
+    offset = 0
+    images = {}
+    annotations = defaultdict(list)
+    categories = defaultdict(set)
+
+    def _write(text):
+        # json.dumps escapes non-ASCII characters, so characters and bytes line up
+        nonlocal offset
+        f.write(text)
+        offset += len(text)
+
+    _write("{")
+    for i, (key, value) in enumerate(coco_json.items()):
+        if i > 0:
+            _write(", ")
+        _write(json.dumps(key) + ": ")
+        if key not in ("images", "annotations"):
+            _write(json.dumps(value))
+            continue
+
+        _write("[")
+        for j, record in enumerate(value):
+            if j > 0:
+                _write(", ")
+            text = json.dumps(record)
+            if key == "images":
+                images[record["id"]] = (offset, len(text))
+            else:
+                annotations[record["image_id"]].append((offset, len(text)))
+                categories[record["category_id"]].add(record["image_id"])
+            _write(text)
+        _write("]")
+    _write("}")
+
+    if index_path is not None:
+        with open(index_path, "w") as index_file:
+            json.dump(
+                {
+                    "images": images,
+                    "annotations": annotations,
+                    "categories": {
+                        category_id: sorted(image_ids)
+                        for category_id, image_ids in categories.items()
+                    },
+                },
+                index_file,
+            )
+
+
+class CocoIndexReader:
+    """
+    Fetches the records of single images from a converted COCO file through its sidecar index,
+    using a memory map instead of parsing the whole file.
+    """
+
+    def __init__(self, coco_json_path, index_path=None):
+        if index_path is None:
+            index_path = coco_json_path + INDEX_SUFFIX
+        with open(index_path, "r") as f:
+            index = json.load(f)
+
+        # json object keys are strings
+        self._images = index["images"]
+        self._annotations = index["annotations"]
+        self._categories = index["categories"]
+
+        self._file = open(coco_json_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read_record(self, offset, length):
+        return json.loads(self._mmap[offset : offset + length])
+
+    @property
+    def image_ids(self):
+        """
+        Ids of all indexed images
+        """
+        return [int(image_id) for image_id in self._images]
+
+    def get_image(self, image_id):
+        """
+        Returns the image record of an image
+        :param image_id: Integer ID of the image
+        :return: Dictionary of the COCO image
+        """
+        return self._read_record(*self._images[str(image_id)])
+
+    def get_annotations(self, image_id):
+        """
+        Returns the annotation records of an image
+        :param image_id: Integer ID of the image
+        :return: List of COCO annotation dictionaries
+        """
+        return [
+            self._read_record(offset, length)
+            for offset, length in self._annotations.get(str(image_id), [])
+        ]
+
+    def get_image_ids(self, category_id):
+        """
+        Returns the ids of images with at least one annotation of a category
+        :param category_id: ID of the category
+        :return: List of image ids
+        """
+        return list(self._categories.get(str(category_id), []))
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,176 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+
+import gzip
+import queue
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_EXTENSIONS = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+}
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ImportError(
+            "zstd compression requires the `zstandard` package. Install it with `pip install gt_converter[zstd]`."
+        )
+
+
+def infer_compression(path, compression=None):
+    """
+    Determine the compression of a file from an explicit option or the file extension.
+    :param path: Path or S3 uri of the file
+    :param compression: `gzip`, `zstd` or None to infer from the extension
+    :return: `gzip`, `zstd` or None for uncompressed files
+    """
+    if compression is not None:
+        if compression not in ("gzip", "zstd"):
+            raise ValueError(
+                "Unsupported compression: {}. Supported are `gzip` and `zstd`.".format(
+                    compression
+                )
+            )
+        return compression
+
+    for extension, inferred in COMPRESSION_EXTENSIONS.items():
+        if path.lower().endswith(extension):
+            return inferred
+    return None
+
+
+def decompress_stream(fileobj, compression):
+    """
+    Wrap a binary file object so reads return decompressed bytes.
+    :param fileobj: Binary file-like object, e.g. an S3 streaming body
+    :param compression: `gzip`, `zstd` or None
+    :return: Binary file-like object
+    """
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    if compression == "zstd":
+        _require_zstandard()
+        return zstandard.ZstdDecompressor().stream_reader(fileobj)
+    return fileobj
+
+
+def open_input(path, compression=None):
+    """
+    Open a local, possibly compressed, file for reading text.
+    :param path: Local path of the file
+    :param compression: `gzip`, `zstd` or None to infer from the extension
+    :return: Text file object
+    """
+    compression = infer_compression(path, compression)
+    if compression == "gzip":
+        return gzip.open(path, mode="rt", encoding="utf-8")
+    if compression == "zstd":
+        _require_zstandard()
+        return zstandard.open(path, mode="rt", encoding="utf-8")
+    return open(path, mode="r")
+
+
+def open_output(path, compression=None):
+    """
+    Open a local file for writing text. Compressed files are compressed on a background thread.
+    :param path: Local path of the file
+    :param compression: `gzip`, `zstd` or None to infer from the extension
+    :return: Text file object
+    """
+    compression = infer_compression(path, compression)
+    if compression is None:
+        return open(path, mode="w")
+    return BackgroundCompressedWriter(path, compression)
+
+
+class BackgroundCompressedWriter:
+    """
+    Text writer that hands buffered output to a background thread for compression, so the
+    converter is not stalled while the compressor runs.
+    """
+
+    def __init__(self, path, compression, buffer_size=WRITE_BUFFER_SIZE, depth=8):
+        if compression == "zstd":
+            _require_zstandard()
+        self._buffer = []
+        self._buffered = 0
+        self._buffer_size = buffer_size
+        self._chunks = queue.Queue(maxsize=depth)
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._compress, args=(path, compression), daemon=True
+        )
+        self._thread.start()
+        self.closed = False
+
+    def _compress(self, path, compression):
+        chunk = b""
+        try:
+            with open(path, "wb") as raw:
+                if compression == "gzip":
+                    compressor = gzip.GzipFile(fileobj=raw, mode="wb")
+                else:
+                    compressor = zstandard.ZstdCompressor().stream_writer(raw)
+                with compressor:
+                    while True:
+                        chunk = self._chunks.get()
+                        if chunk is None:
+                            break
+                        compressor.write(chunk)
+        except Exception as e:  # surfaced on the writing thread
+            self._error = e
+            # Keep draining so the writer never blocks on a full queue
+            while chunk is not None:
+                chunk = self._chunks.get()
+
+    def _check_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _flush_buffer(self):
+        if self._buffer:
+            self._chunks.put("".join(self._buffer).encode("utf-8"))
+            self._buffer = []
+            self._buffered = 0
+
+    def write(self, s):
+        self._check_error()
+        self._buffer.append(s)
+        self._buffered += len(s)
+        if self._buffered >= self._buffer_size:
+            self._flush_buffer()
+        return len(s)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._flush_buffer()
+        self._chunks.put(None)
+        self._thread.join()
+        self._check_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,3 +1,4 @@
+import os
 import json
 import io
 import ast
@@ -9,18 +10,23 @@ from skimage import img_as_ubyte
 from skimage.color import rgba2rgb
 from shapely.geometry import Polygon, MultiPolygon
 
+from gt_converter.coco_index import INDEX_SUFFIX, write_coco_json
+from gt_converter.compression import infer_compression, open_output
 from gt_converter.converter import Converter
-from gt_converter.utils import split_s3_bucket_key
+from gt_converter.sampling import ManifestSampler
+from gt_converter.s3_transfer import DEFAULT_MAX_CONCURRENCY
 import tqdm
 
+MOT_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
 
 class CocoConverter(Converter):
     """
     Converter from GT format to COCO standard.
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        super().__init__(max_concurrency)
         self.background_color = (255, 255, 255)
 
     def _build_category_ids(self, manifest_path, job_name, background_color):
@@ -152,14 +158,47 @@ class CocoConverter(Converter):
 
         return current_annotation_id, annotations
 
+    def _sampled_manifest_reader(self, manifest_path, sampler, classes):
+        """
+        Returns the manifest lines, restricted to a sample if a sampler is given
+        :param manifest_path: Path of the GT manifest file
+        :param sampler: ManifestSampler or None to read every line
+        :param classes: Function returning the classes of a manifest line for stratification
+        :return: Iterable of manifest lines
+        """
+        if sampler is None:
+            return self.manifest_reader(manifest_path)
+        return sampler.sample(self.manifest_reader(manifest_path), classes)
+
+    def _segmentation_classes(self, annotation, job_name):
+        """
+        Returns the non-background class names present in a segmentation manifest line
+        """
+        background_hex = "#{:02x}{:02x}{:02x}".format(*self.background_color)
+        color_map = annotation[job_name + "-ref-metadata"]["internal-color-map"]
+        return [
+            label["class-name"]
+            for label in color_map.values()
+            if label["hex-color"].lower() != background_hex
+        ]
+
     def _convert_segmentation_manifest(
-        self, manifest_path, job_name, output_coco_json_path
+        self,
+        manifest_path,
+        job_name,
+        output_coco_json_path,
+        compression=None,
+        sampler=None,
+        index_path=None,
     ):
         """
         Converts a single segmentation manifest file into COCO format.
         :param manifest_path: Path of the GT manifest file
         :param job_name: Name of the GT job
         :param output_coco_json_path: Output path for converted COCO json.
+        :param compression: `gzip`, `zstd` or None to infer from the output extension
+        :param sampler: ManifestSampler to only convert (and download masks for) a subset of lines
+        :param index_path: Path to write a sidecar index of the output, or None to skip it
         """
         category_ids = self._build_category_ids(
             manifest_path, job_name, self.background_color
@@ -169,30 +208,37 @@ class CocoConverter(Converter):
         annotations = []
         images = []
 
-        for annotation in tqdm.tqdm(
-            self.manifest_reader(manifest_path), total=self.manifestcount
-        ):
-            bucket, key = split_s3_bucket_key(annotation[job_name + "-ref"])
+        lines = self._sampled_manifest_reader(
+            manifest_path,
+            sampler,
+            lambda line: self._segmentation_classes(line, job_name),
+        )
+        total = self.manifestcount if sampler is None else len(lines)
 
-            outfile = io.BytesIO()
-            self.s3_client.download_fileobj(bucket, key, outfile)
-            outfile.seek(0)
+        # Masks are downloaded concurrently ahead of the annotation loop
+        masks = self.s3_transfer.iter_download(
+            lines, lambda line: line[job_name + "-ref"]
+        )
 
-            img_annotated = img_as_ubyte(rgba2rgb(skio.imread(outfile)))
-            current_annotation_id, img_annotations = self._annotate_single_image(
-                img_annotated, image_id, category_ids, current_annotation_id
-            )
-            w, h, c = img_annotated.shape
-            images.append(
-                {
-                    "file_name": annotation["source-ref"],
-                    "height": h,
-                    "width": w,
-                    "id": image_id,
-                }
-            )
-            annotations.extend(img_annotations)
-            image_id += 1
+        try:
+            for annotation, mask in tqdm.tqdm(masks, total=total):
+                img_annotated = img_as_ubyte(rgba2rgb(skio.imread(io.BytesIO(mask))))
+                current_annotation_id, img_annotations = self._annotate_single_image(
+                    img_annotated, image_id, category_ids, current_annotation_id
+                )
+                w, h, c = img_annotated.shape
+                images.append(
+                    {
+                        "file_name": annotation["source-ref"],
+                        "height": h,
+                        "width": w,
+                        "id": image_id,
+                    }
+                )
+                annotations.extend(img_annotations)
+                image_id += 1
+        finally:
+            masks.close()
 
         coco_json = {
             "type": "instances",
@@ -201,15 +247,26 @@ class CocoConverter(Converter):
             "annotations": annotations,
         }
 
-        with open(output_coco_json_path, "w") as f:
-            json.dump(coco_json, f)
-
-    def _convert_bbox_manifest(self, manifest_path, job_name, output_coco_json_path):
+        with open_output(output_coco_json_path, compression) as f:
+            write_coco_json(f, coco_json, index_path)
+
+    def _convert_bbox_manifest(
+        self,
+        manifest_path,
+        job_name,
+        output_coco_json_path,
+        compression=None,
+        sampler=None,
+        index_path=None,
+    ):
         """
         Converts a single bounding box manifest file into COCO format.
         :param manifest_path: Path of the GT manifest file
         :param job_name: Name of the GT job
         :param output_coco_json_path: Output path for converted COCO json.
+        :param compression: `gzip`, `zstd` or None to infer from the output extension
+        :param sampler: ManifestSampler to only convert a subset of lines
+        :param index_path: Path to write a sidecar index of the output, or None to skip it
         """
         image_id = 0
         annotation_id = 0
@@ -217,7 +274,11 @@ class CocoConverter(Converter):
         images = []
         category_ids = {}
 
-        for annotation in self.manifest_reader(manifest_path):
+        for annotation in self._sampled_manifest_reader(
+            manifest_path,
+            sampler,
+            lambda line: line[job_name + "-metadata"]["class-map"].keys(),
+        ):
             w = annotation[job_name]["image_size"][0]["width"]
             h = annotation[job_name]["image_size"][0]["height"]
             images.append(
@@ -253,17 +314,18 @@ class CocoConverter(Converter):
             "annotations": annotations,
         }
 
-        with open(output_coco_json_path, "w") as f:
-            json.dump(coco_json, f)
+        with open_output(output_coco_json_path, compression) as f:
+            write_coco_json(f, coco_json, index_path)
 
     def _convert_video_tracking_manifest(
-        self, manifest_path, job_name, output_coco_json_path
+        self, manifest_path, job_name, output_coco_json_path, compression=None
     ):
         """
         Converts a single video tracking manifest file into COCO format.
         :param manifest_path: Path of the GT manifest file
         :param job_name: Name of the GT job
         :param output_coco_json_path: Output path for converted COCO json.
+        :param compression: `gzip`, `zstd` or None to infer from the output extension
         """
         # image_id = 0 # -> frame_id
         seq_id = 1  # sequence_id, starts from 1 in the GT input manifest
@@ -336,14 +398,153 @@ class CocoConverter(Converter):
                 sequences["sequence-" + str(seq_id)].append(coco_json)
             seq_id += 1
 
-        with open(output_coco_json_path, "w") as f:
+        with open_output(output_coco_json_path, compression) as f:
             json.dump(sequences, f)
 
-    def convert_job(self, job_name, output_coco_json_path):
+    def _convert_video_tracking_manifest_tracks(
+        self, manifest_path, job_name, output_json_path, compression=None
+    ):
+        """
+        Converts a video tracking manifest into a compact track-oriented format, written in one
+        streaming pass. Each sequence holds a single images table and one entry per track with
+        parallel arrays of frame ids and boxes; categories are deduplicated across sequences.
+        :param manifest_path: Path of the GT manifest file
+        :param job_name: Name of the GT job
+        :param output_json_path: Output path for converted json.
+        :param compression: `gzip`, `zstd` or None to infer from the output extension
+        """
+        categories = {}
+
+        with open_output(output_json_path, compression) as f:
+            f.write('{"sequences": [')
+
+            for seq_id, output_manifest in enumerate(
+                self.manifest_reader(manifest_path), start=1
+            ):
+                seq_label_path = output_manifest[job_name + "-ref"]
+                print("Processing sequence: " + str(seq_id))
+                if seq_id > 1:
+                    f.write(", ")
+                f.write(
+                    '{"id": %d, "seq_label": %s, "images": ['
+                    % (seq_id, json.dumps(seq_label_path))
+                )
+
+                tracks = {}
+                for frame_index, frame in enumerate(
+                    self.tracking_manifest_reader(seq_label_path)
+                ):
+                    frame_id = frame["frame-no"]
+                    if frame_index > 0:
+                        f.write(", ")
+                    json.dump({"id": frame_id, "file_name": frame["frame"]}, f)
+
+                    for annotation in frame["annotations"]:
+                        track = tracks.get(annotation["object-id"])
+                        if track is None:
+                            track = tracks[annotation["object-id"]] = {
+                                "id": annotation["object-id"],
+                                "name": annotation["object-name"],
+                                "category_id": annotation["class-id"],
+                                "frame_ids": [],
+                                "bboxes": [],
+                            }
+                        track["frame_ids"].append(frame_id)
+                        track["bboxes"].append(
+                            (
+                                annotation["left"],
+                                annotation["top"],
+                                annotation["width"],
+                                annotation["height"],
+                            )
+                        )
+                        categories.setdefault(
+                            annotation["class-id"],
+                            {
+                                "id": annotation["class-id"],
+                                "name": annotation["object-name"].split(":")[0],
+                            },
+                        )
+
+                f.write('], "tracks": ')
+                json.dump(list(tracks.values()), f)
+                f.write("}")
+
+            f.write('], "categories": ')
+            json.dump(list(categories.values()), f)
+            f.write("}")
+
+    def _convert_video_tracking_manifest_mot(
+        self, manifest_path, job_name, output_dir, compression=None
+    ):
+        """
+        Converts a video tracking manifest into MOTChallenge ground truth text files, one
+        `<output_dir>/sequence-<n>/gt/gt.txt` per sequence (`gt.txt.gz`/`gt.txt.zst` when
+        compressed). Lines are `frame,id,left,top,width,height,1,class,1` with 1-based frame
+        numbers, integer track ids assigned per sequence in order of first appearance, and
+        1-based classes (GT `class-id` + 1) as MOTChallenge expects.
+        :param manifest_path: Path of the GT manifest file
+        :param job_name: Name of the GT job
+        :param output_dir: Output directory for the sequence folders.
+        :param compression: `gzip`, `zstd` or None to write plain text files
+        """
+        for seq_id, output_manifest in enumerate(
+            self.manifest_reader(manifest_path), start=1
+        ):
+            seq_label_path = output_manifest[job_name + "-ref"]
+            print("Processing sequence: " + str(seq_id))
+            gt_dir = os.path.join(output_dir, "sequence-" + str(seq_id), "gt")
+            os.makedirs(gt_dir, exist_ok=True)
+
+            track_ids = {}
+            gt_path = os.path.join(gt_dir, "gt.txt")
+            if compression is not None:
+                gt_path += MOT_EXTENSIONS[compression]
+
+            with open_output(gt_path, compression) as f:
+                for frame in self.tracking_manifest_reader(seq_label_path):
+                    for annotation in frame["annotations"]:
+                        track_id = track_ids.setdefault(
+                            annotation["object-id"], len(track_ids) + 1
+                        )
+                        f.write(
+                            "{},{},{},{},{},{},1,{},1\n".format(
+                                frame["frame-no"] + 1,
+                                track_id,
+                                annotation["left"],
+                                annotation["top"],
+                                annotation["width"],
+                                annotation["height"],
+                                annotation["class-id"] + 1,
+                            )
+                        )
+
+    def convert_job(
+        self,
+        job_name,
+        output_coco_json_path,
+        tracking_format="coco",
+        compression=None,
+        sample_size=None,
+        stratify=False,
+        seed=None,
+        write_index=False,
+    ):
         """
         Converts a SageMaker Ground Truth job's manifest file to COCO format.
         :param job_name: Name of the GT job (str)
-        :param output_coco_json_path: Path to write output file
+        :param output_coco_json_path: Path to write output file (a directory for `mot`)
+        :param tracking_format: Output format for video tracking jobs. One of `coco` (per-frame
+            COCO dicts), `tracks` (compact track-oriented json) or `mot` (MOTChallenge gt.txt).
+        :param compression: Output compression, `gzip` or `zstd`. By default it is inferred from the
+            extension of output_coco_json_path (`.gz`, `.zst`).
+        :param sample_size: Only convert a sample of an image job's manifest for a quick preview.
+            Either a number of lines (int) or a fraction of the manifest (float).
+        :param stratify: Sample per class, using the `class-map` or `internal-color-map` metadata.
+            Lines without any class (e.g. background-only masks) are sampled as their own stratum.
+        :param seed: Random seed for reproducible samples
+        :param write_index: Write a sidecar index (`<output>.index.json`) of an image job's output
+            for random access with CocoIndexReader. Not supported for compressed output.
         """
         job_description = self.sm_client.describe_labeling_job(LabelingJobName=job_name)
         job_state = job_description["LabelingJobStatus"]
@@ -356,20 +557,64 @@ class CocoConverter(Converter):
                 )
 
             manifest_path = job_description["LabelingJobOutput"]["OutputDatasetS3Uri"]
+            sampler = None
+            if sample_size is not None:
+                if "Video" in job_task_keywords:
+                    raise NotImplementedError(
+                        "Sampling is only supported for image labeling tasks at the moment."
+                    )
+                sampler = ManifestSampler(sample_size, stratify=stratify, seed=seed)
+
+            index_path = None
+            if write_index:
+                if "Video" in job_task_keywords:
+                    raise NotImplementedError(
+                        "Output indexes are only supported for image labeling tasks at the moment."
+                    )
+                if infer_compression(output_coco_json_path, compression) is not None:
+                    raise ValueError(
+                        "Output indexes hold byte offsets and require uncompressed output."
+                    )
+                index_path = output_coco_json_path + INDEX_SUFFIX
 
             if "bounding boxes" in job_task_keywords:
                 self._convert_bbox_manifest(
-                    manifest_path, job_name, output_coco_json_path
+                    manifest_path,
+                    job_name,
+                    output_coco_json_path,
+                    compression,
+                    sampler,
+                    index_path,
                 )
             elif "image segmentation" in job_task_keywords:
                 self._convert_segmentation_manifest(
-                    manifest_path, job_name, output_coco_json_path
+                    manifest_path,
+                    job_name,
+                    output_coco_json_path,
+                    compression,
+                    sampler,
+                    index_path,
                 )
 
             elif "Video" in job_task_keywords and "tracking" in job_task_keywords:
-                self._convert_video_tracking_manifest(
-                    manifest_path, job_name, output_coco_json_path
-                )
+                if tracking_format == "coco":
+                    self._convert_video_tracking_manifest(
+                        manifest_path, job_name, output_coco_json_path, compression
+                    )
+                elif tracking_format == "tracks":
+                    self._convert_video_tracking_manifest_tracks(
+                        manifest_path, job_name, output_coco_json_path, compression
+                    )
+                elif tracking_format == "mot":
+                    self._convert_video_tracking_manifest_mot(
+                        manifest_path, job_name, output_coco_json_path, compression
+                    )
+                else:
+                    raise ValueError(
+                        "Unknown tracking format: {}. Supported formats are `coco`, `tracks` and `mot`.".format(
+                            tracking_format
+                        )
+                    )
 
             else:
                 raise ValueError(
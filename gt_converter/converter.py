@@ -15,7 +15,15 @@ import os
 import abc
 import json
 import boto3
-
+from botocore.config import Config
+
+from gt_converter.compression import decompress_stream, infer_compression, open_input
+from gt_converter.json_stream import (
+    DEFAULT_CHUNK_SIZE,
+    iter_json_array,
+    prefetch_chunks,
+)
+from gt_converter.s3_transfer import DEFAULT_MAX_CONCURRENCY, S3TransferManager
 from gt_converter.utils import split_s3_bucket_key
 
 
@@ -24,68 +32,116 @@ class Converter(abc.ABC):
     Abstract base class for data format converters.
     """
 
-    def __init__(self):
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        :param max_concurrency: Maximum number of concurrent S3 requests
+        """
         self.sm_client = boto3.client("sagemaker")
-        self.s3_client = boto3.client("s3")
+        # Retries are handled by the transfer manager so it can react to throttling. This also
+        # applies to streamed bodies: reads of a SeqLabel body in tracking_manifest_reader are
+        # not retried, a failure there fails the conversion.
+        self.s3_client = boto3.client(
+            "s3",
+            config=Config(
+                max_pool_connections=max_concurrency, retries={"max_attempts": 0}
+            ),
+        )
+        self.s3_transfer = S3TransferManager(
+            self.s3_client, max_concurrency=max_concurrency
+        )
+
+    def close(self):
+        """
+        Cancels pending S3 downloads and releases the transfer threads.
+        """
+        self.s3_transfer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     @abc.abstractmethod
     def convert_job(self, job_name, output_coco_json_path):
         pass
 
-    def _maybe_download_from_s3(self, manifest_path, localpathname="local_manifest"):
+    def _maybe_download_from_s3(
+        self, manifest_path, localpathname="local_manifest", compression=None
+    ):
         """
         Downloads manifest local disk if s3 path is specified. If the manifest was downloaded from S3
         then a flag will be returned so the local file can be removed after conversion.
         :param manifest_path: Path of manifest file
-        :return: manifest_path(str), cleanup_flag(bool)
+        :param compression: Compression of the manifest (`gzip`, `zstd` or None)
+        :return: manifest_path(str), cleanup_flag(bool), line_count(int or None)
         """
         if "s3://" == manifest_path[:5]:
             bucket, key = split_s3_bucket_key(manifest_path)
 
             with open(localpathname, "wb") as f:
-                self.s3_client.download_fileobj(bucket, key, f)
+                self.s3_transfer.download_fileobj(bucket, key, f)
                 manifest_path = localpathname
 
             # counting lines for progressbar
-            with open(localpathname) as f:
-                count = len(list(f))
+            with open_input(localpathname, compression) as f:
+                count = sum(1 for _ in f)
 
             return manifest_path, True, count
 
         else:
-            return manifest_path, False
+            return manifest_path, False, None
 
-    def manifest_reader(self, manifest_path, localpathname="output_manifest"):
+    def manifest_reader(
+        self, manifest_path, localpathname="output_manifest", compression=None
+    ):
         """
         Generator to return each image GT annotations
         :param manifest_path: Path of manifest file
+        :param compression: `gzip`, `zstd` or None to infer from the extension of manifest_path
         """
+        compression = infer_compression(manifest_path, compression)
         manifest_path, cleanup, self.manifestcount = self._maybe_download_from_s3(
-            manifest_path, localpathname
+            manifest_path, localpathname, compression
         )
 
-        for line in open(manifest_path, mode="r"):
-            yield json.loads(line)
+        with open_input(manifest_path, compression) as f:
+            for line in f:
+                yield json.loads(line)
 
         if cleanup:
             os.remove(manifest_path)
 
     def tracking_manifest_reader(
-        self, manifest_path, localpathname="tracking_manifest"
+        self,
+        manifest_path,
+        localpathname="tracking_manifest",
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        compression=None,
     ):
         """
-        Generator to return annotationsf from each sequence of frames
-        :param manifest_path: Path of manifest file
+        Generator to return annotations from each frame of a sequence. The SeqLabel file is parsed
+        incrementally while it is read from S3 or disk, so only a single frame is held in memory.
+        Decompression runs on the same background thread that reads the file. The GET of an S3
+        SeqLabel file is retried, but errors while streaming its body are not.
+        :param manifest_path: Path of SeqLabel file
+        :param localpathname: Unused, the SeqLabel file is no longer downloaded to local disk
+        :param chunk_size: Number of bytes read from the file at a time
+        :param compression: `gzip`, `zstd` or None to infer from the extension of manifest_path
         """
-
-        manifest_path, cleanup, self.manifestcount = self._maybe_download_from_s3(
-            manifest_path, localpathname
-        )
-
-        for annotation in json.load(open(manifest_path, mode="r"))[
-            "tracking-annotations"
-        ]:
-            yield annotation
-
-        if cleanup:
-            os.remove(manifest_path)
+        compression = infer_compression(manifest_path, compression)
+        if "s3://" == manifest_path[:5]:
+            bucket, key = split_s3_bucket_key(manifest_path)
+            fileobj = self.s3_transfer.get_object(bucket, key)["Body"]
+        else:
+            fileobj = open(manifest_path, mode="rb")
+
+        stream = decompress_stream(fileobj, compression)
+        chunks = prefetch_chunks(stream, chunk_size)
+        try:
+            for frame in iter_json_array(chunks, "tracking-annotations"):
+                yield frame
+        finally:
+            chunks.close()
+            stream.close()
+            fileobj.close()
@@ -0,0 +1,166 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+
+import codecs
+import json
+import queue
+import threading
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+def prefetch_chunks(fileobj, chunk_size=DEFAULT_CHUNK_SIZE, depth=4):
+    """
+    Generator that reads a file object on a background thread so the read (e.g. an S3 download)
+    overlaps with the consumer's processing.
+    :param fileobj: Binary file-like object with a read(size) method
+    :param chunk_size: Number of bytes requested per read
+    :param depth: Maximum number of chunks buffered ahead of the consumer
+    :return: Generator of bytes chunks
+    """
+    chunks = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def _reader():
+        try:
+            while not stop.is_set():
+                chunk = fileobj.read(chunk_size)
+                chunks.put(chunk)
+                if not chunk:
+                    return
+        except Exception as e:  # surfaced on the consumer thread
+            chunks.put(e)
+
+    thread = threading.Thread(target=_reader, daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        # Free up the queue so a reader blocked on put() can see the stop flag and exit,
+        # and wait for it so the caller can safely close the file object afterwards
+        stop.set()
+        while not chunks.empty():
+            chunks.get_nowait()
+        thread.join()
+
+
+class _JsonTokenStream:
+    """
+    Text buffer over an iterator of bytes chunks that only holds the unparsed remainder.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self.eof = False
+
+    def _fill(self, min_chars=1):
+        """
+        Reads chunks until at least min_chars more characters are buffered or the stream ends.
+        """
+        if self._pos > len(self._buf) // 2:
+            self._buf = self._buf[self._pos :]
+            self._pos = 0
+        target = len(self._buf) + min_chars
+        while len(self._buf) < target and not self.eof:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._buf += self._decoder.decode(b"", final=True)
+                self.eof = True
+            else:
+                self._buf += self._decoder.decode(chunk)
+
+    def peek(self):
+        """
+        Returns the next non-whitespace character without consuming it ("" at end of stream).
+        """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf) or self.eof:
+                return self._buf[self._pos : self._pos + 1]
+            self._fill()
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(
+                "Expected '{}' in JSON stream, found '{}'".format(char, found)
+            )
+        self._pos += 1
+
+    def value(self):
+        """
+        Decodes and consumes the next complete JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                obj, end = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # A number at the end of the buffer may continue in the next chunk, and one
+                # split after "." or "e" decodes as its prefix, e.g. "1." as 1
+                complete = end < len(self._buf)
+                if complete and type(obj) in (int, float):
+                    complete = self._buf[end] not in _NUMBER_CHARS
+                if complete or self.eof:
+                    self._pos = end
+                    return obj
+            # Grow geometrically so large values are not re-decoded once per chunk
+            self._fill(max(len(self._buf) - self._pos, DEFAULT_CHUNK_SIZE))
+
+
+def iter_json_array(chunks, key):
+    """
+    Incrementally parses a JSON document and yields the items of the array stored under a
+    top-level key, so memory is bounded by the largest single item rather than the whole document.
+    :param chunks: Iterable of bytes chunks holding a JSON object
+    :param key: Top-level key of the array to stream
+    :return: Generator of decoded array items
+    """
+    stream = _JsonTokenStream(chunks)
+    stream.expect("{")
+    if stream.peek() == "}":
+        raise KeyError(key)
+
+    while True:
+        name = stream.value()
+        stream.expect(":")
+        if name == key:
+            stream.expect("[")
+            if stream.peek() == "]":
+                return
+            while True:
+                yield stream.value()
+                if stream.peek() == "]":
+                    return
+                stream.expect(",")
+        # Other top-level values are small metadata and are decoded and dropped
+        stream.value()
+        if stream.peek() == "}":
+            raise KeyError(key)
+        stream.expect(",")
@@ -0,0 +1,321 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ConnectionError as BotocoreConnectionError
+from botocore.exceptions import HTTPClientError
+
+from gt_converter.utils import split_s3_bucket_key
+
+DEFAULT_MAX_CONCURRENCY = 10
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+THROTTLING_ERROR_CODES = {
+    "SlowDown",
+    "Throttling",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "TooManyRequests",
+    "RequestThrottled",
+}
+
+
+def _error_response(error):
+    response = getattr(error, "response", None)
+    return response if isinstance(response, dict) else {}
+
+
+def _error_code(error):
+    return _error_response(error).get("Error", {}).get("Code")
+
+
+def is_throttling_error(error):
+    """
+    Returns True if an S3 client error signals throttling (e.g. SlowDown)
+    """
+    response = _error_response(error)
+    status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return _error_code(error) in THROTTLING_ERROR_CODES or status == 503
+
+
+def is_retryable_error(error):
+    """
+    Returns True for throttling, server side and connection errors
+    """
+    if isinstance(error, (BotocoreConnectionError, HTTPClientError)):
+        return True
+    status = _error_response(error).get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return is_throttling_error(error) or (status is not None and status >= 500)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Bounds the number of in-flight requests. The limit grows additively while requests succeed
+    at a steady latency, and shrinks multiplicatively on throttling or when latency rises well
+    above its moving average. Every decrease starts a new generation, and only requests acquired
+    in the current generation can trigger the next one, so a burst of concurrent throttles
+    shrinks the limit once rather than once per response.
+    """
+
+    def __init__(
+        self,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        min_concurrency=1,
+        latency_tolerance=2.0,
+        smoothing=0.2,
+    ):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self._limit = float(max_concurrency)
+        self._latency = None
+        self._in_flight = 0
+        self._generation = 0
+        self._condition = threading.Condition()
+
+    @property
+    def concurrency(self):
+        """
+        Current number of requests allowed in flight
+        """
+        return max(self.min_concurrency, int(self._limit))
+
+    def acquire(self):
+        """
+        Waits for a free request slot.
+        :return: Token to pass to release
+        """
+        with self._condition:
+            while self._in_flight >= self.concurrency:
+                self._condition.wait()
+            self._in_flight += 1
+            return self._generation
+
+    def _decrease(self, token, factor):
+        # Requests started before the last decrease reflect the congestion it already handled
+        if token == self._generation:
+            self._limit = max(self.min_concurrency, self._limit * factor)
+            self._generation += 1
+
+    def release(self, token, latency=None, throttled=False):
+        """
+        Frees a request slot and adapts the limit.
+        :param token: Token returned by acquire
+        :param latency: Duration of the request in seconds, None if it failed
+        :param throttled: True if the request was throttled
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self._decrease(token, 0.5)
+            elif latency is not None:
+                if self._latency is None:
+                    self._latency = latency
+                if latency > self.latency_tolerance * self._latency:
+                    self._decrease(token, 0.9)
+                else:
+                    self._limit = min(
+                        self.max_concurrency, self._limit + 1 / self._limit
+                    )
+                self._latency += self.smoothing * (latency - self._latency)
+            self._condition.notify_all()
+
+
+class S3TransferManager:
+    """
+    Shared S3 download layer. Objects up to part_size are fetched with a single ranged GET, larger
+    ones with parallel ranged GETs of part_size. All requests pass through an
+    AdaptiveConcurrencyLimiter and throttled or failed requests are retried with backoff.
+    The client only needs get_object, so tests can use a local stand-in.
+    """
+
+    def __init__(
+        self,
+        client,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        part_size=DEFAULT_PART_SIZE,
+        max_attempts=8,
+        backoff_base=0.1,
+        max_backoff=5.0,
+        sleep=time.sleep,
+    ):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.part_size = part_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.limiter = AdaptiveConcurrencyLimiter(max_concurrency)
+        self._sleep = sleep
+        # Objects and their parts use separate pools so an object never waits on its own pool
+        self._object_pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._part_pool = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def close(self):
+        """
+        Cancels pending downloads and waits for running requests to finish.
+        """
+        for pool in (self._object_pool, self._part_pool):
+            if sys.version_info >= (3, 9):
+                pool.shutdown(cancel_futures=True)
+            else:
+                pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _call(self, request, consume=None):
+        """
+        Runs a request under the concurrency limit, retrying retryable errors with jittered
+        exponential backoff. The limiter is fed the time to first byte, i.e. the duration of
+        request alone, so it does not depend on the size of the object.
+        :param request: Function without arguments performing the request
+        :param consume: Optional function reading the response, e.g. its body. It runs under the
+            same request slot and is retried together with the request.
+        :return: Response, or the result of consume
+        """
+        for attempt in range(self.max_attempts):
+            token = self.limiter.acquire()
+            start = time.monotonic()
+            try:
+                result = request()
+                latency = time.monotonic() - start
+                if consume is not None:
+                    result = consume(result)
+            except Exception as e:
+                self.limiter.release(token, throttled=is_throttling_error(e))
+                if not is_retryable_error(e) or attempt == self.max_attempts - 1:
+                    raise
+                backoff = min(self.max_backoff, self.backoff_base * 2**attempt)
+                self._sleep(backoff * random.uniform(0.5, 1.0))
+            else:
+                self.limiter.release(token, latency)
+                return result
+
+    def _get_range(self, bucket, key, start, end, etag=None):
+        """
+        Downloads a byte range of an object.
+        :param etag: ETag the object must still have, so parts of different versions of an
+            overwritten object are never combined
+        :return: bytes, total size of the object (None if unknown), ETag of the object
+        """
+        kwargs = {
+            "Bucket": bucket,
+            "Key": key,
+            "Range": "bytes={}-{}".format(start, end),
+        }
+        if etag is not None:
+            kwargs["IfMatch"] = etag
+
+        try:
+            response, data = self._call(
+                lambda: self.client.get_object(**kwargs),
+                lambda response: (response, response["Body"].read()),
+            )
+        except Exception as e:
+            # Ranged GETs of empty objects are rejected
+            if start == 0 and _error_code(e) == "InvalidRange":
+                return b"", 0, None
+            raise
+
+        content_range = response.get("ContentRange")
+        size = None if content_range is None else int(content_range.rsplit("/", 1)[1])
+        return data, size, response.get("ETag")
+
+    def _ordered(self, pool, function, items, window):
+        """
+        Generator that maps function over items on a pool with at most window items pending,
+        yielding (item, result) in input order.
+        """
+        pending = deque()
+        try:
+            for item in items:
+                pending.append((item, pool.submit(function, item)))
+                if len(pending) >= window:
+                    item, future = pending.popleft()
+                    yield item, future.result()
+            while pending:
+                item, future = pending.popleft()
+                yield item, future.result()
+        finally:
+            # Stop downloads nobody will consume if the caller exits early or fails
+            for _, future in pending:
+                future.cancel()
+
+    def iter_object_parts(self, bucket, key):
+        """
+        Generator returning the bytes of an object in order. The first part is a single GET; if
+        the object is larger than part_size the remaining parts are downloaded in parallel.
+        """
+        data, size, etag = self._get_range(bucket, key, 0, self.part_size - 1)
+        yield data
+        if size is None or size <= len(data):
+            return
+
+        ranges = [
+            (start, min(start + self.part_size, size) - 1)
+            for start in range(len(data), size, self.part_size)
+        ]
+        for _, part in self._ordered(
+            self._part_pool,
+            lambda byte_range: self._get_range(bucket, key, *byte_range, etag=etag)[0],
+            ranges,
+            self.max_concurrency,
+        ):
+            yield part
+
+    def download_bytes(self, bucket, key):
+        """
+        Downloads an object into memory.
+        :return: Object bytes
+        """
+        return b"".join(self.iter_object_parts(bucket, key))
+
+    def download_fileobj(self, bucket, key, fileobj):
+        """
+        Downloads an object into a writable binary file object.
+        """
+        for part in self.iter_object_parts(bucket, key):
+            fileobj.write(part)
+
+    def iter_download(self, items, get_uri):
+        """
+        Generator downloading the S3 objects of a stream of items concurrently, with a bounded
+        number of objects pending.
+        :param items: Iterable of items, e.g. manifest lines
+        :param get_uri: Function returning the S3 uri of an item
+        :return: Generator of (item, bytes) in input order
+        """
+        return self._ordered(
+            self._object_pool,
+            lambda item: self.download_bytes(*split_s3_bucket_key(get_uri(item))),
+            items,
+            2 * self.max_concurrency,
+        )
+
+    def get_object(self, bucket, key):
+        """
+        Issues a GET for streaming reads. Only the request itself is retried; failures while
+        the caller reads the body are not.
+        :return: get_object response
+        """
+        return self._call(lambda: self.client.get_object(Bucket=bucket, Key=key))
@@ -0,0 +1,102 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+
+import heapq
+import random
+
+# Stratum of lines without any class, e.g. negative images
+_NO_CLASS = object()
+
+
+class _Reservoir:
+    """
+    Bottom-k reservoir: keeps the k lines with the smallest random keys seen so far, which is a
+    uniform sample of size k from the stream.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []  # (-key, index, line), the largest key sits on top
+
+    def offer(self, key, index, line):
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (-key, index, line))
+        elif -self._heap[0][0] > key:
+            heapq.heapreplace(self._heap, (-key, index, line))
+
+    def items(self):
+        return [(index, line) for _, index, line in self._heap]
+
+
+class ManifestSampler:
+    """
+    Selects a subset of manifest lines in a single streaming pass.
+
+    `size` is either a number of lines (int) or a fraction of the manifest (float in (0, 1]).
+    A number of lines is drawn exactly with bottom-k reservoir sampling. A fraction keeps each
+    line independently with that probability (Bernoulli sampling), since the manifest length is
+    not known up front, so the sample size is only approximately fraction * lines.
+    With `stratify`, an int size is the number of lines kept per class (a line with several
+    classes can count towards each of them). A fraction is still a single global Bernoulli
+    sample, plus one reservoir-sampled line for every class the sample would otherwise miss.
+    Lines without any class form a stratum of their own, so negative images are kept too.
+    """
+
+    def __init__(self, size, stratify=False, seed=None):
+        if isinstance(size, bool) or not isinstance(size, (int, float)):
+            raise TypeError("Sample size must be an int or a float.")
+        if isinstance(size, int) and size < 1:
+            raise ValueError("Sample size must be a positive number of lines.")
+        if isinstance(size, float) and not 0.0 < size <= 1.0:
+            raise ValueError("Sample fraction must be in the interval (0, 1].")
+
+        self.size = size
+        self.stratify = stratify
+        self._random = random.Random(seed)
+
+    def sample(self, lines, classes=None):
+        """
+        Sample manifest lines.
+        :param lines: Iterable of manifest lines
+        :param classes: Function returning the classes of a manifest line, required to stratify
+        :return: List of sampled lines in manifest order
+        """
+        if self.stratify and classes is None:
+            raise ValueError("Stratified sampling requires the classes of each line.")
+
+        selected = {}
+        reservoirs = {}
+        fraction = isinstance(self.size, float)
+        if not self.stratify and not fraction:
+            reservoirs[None] = _Reservoir(self.size)
+
+        for index, line in enumerate(lines):
+            key = self._random.random()
+            if fraction and key < self.size:
+                selected[index] = line
+
+            if self.stratify:
+                # With a fraction, the smallest key of each class is kept so rare classes are
+                # never dropped
+                k = 1 if fraction else self.size
+                for label in list(classes(line)) or [_NO_CLASS]:
+                    if label not in reservoirs:
+                        reservoirs[label] = _Reservoir(k)
+                    reservoirs[label].offer(key, index, line)
+            elif not fraction:
+                reservoirs[None].offer(key, index, line)
+
+        for reservoir in reservoirs.values():
+            selected.update(reservoir.items())
+
+        return [selected[index] for index in sorted(selected)]
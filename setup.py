@@ -26,7 +26,10 @@ def read_version():
 
 
 # Specific use case dependencies
-extras = {"test": (["flake8", "pytest", "black", "flaky"],)}
+extras = {
+    "test": (["flake8", "pytest", "black", "flaky"],),
+    "zstd": ["zstandard"],
+}
 
 
 setup(
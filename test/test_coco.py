@@ -11,6 +11,8 @@
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
 
+import json
+
 from skimage import io as skio
 from skimage import img_as_ubyte
 from skimage.color import rgba2rgb
@@ -77,4 +79,21 @@ def test_videotracking_job_conversion(tmpdir):
         print(outfile.readlines())
 
 
+def test_videotracking_job_conversion_tracks(tmpdir):
+    """
+    This test will only pass with credentials for GT labeling job and S3 bucket.
+    """
+    job_name = "MOT20example-clone"
+    converter = CocoConverter()
+    converter.convert_job(
+        job_name, output_coco_json_path=tmpdir + "output.json", tracking_format="tracks"
+    )
+
+    with open(tmpdir + "output.json", "r") as outfile:
+        output = json.load(outfile)
+    for sequence in output["sequences"]:
+        for track in sequence["tracks"]:
+            assert len(track["frame_ids"]) == len(track["bboxes"])
+
+
 test_videotracking_job_conversion("/tmp/")
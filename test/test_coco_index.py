@@ -0,0 +1,70 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+
+import json
+
+from gt_converter.coco_index import INDEX_SUFFIX, CocoIndexReader, write_coco_json
+
+
+def _coco_json():
+    images = [
+        {
+            "file_name": "s3://bucket/ünïcode-{}.png".format(i),
+            "height": 10,
+            "width": 20,
+            "id": i,
+        }
+        for i in range(3)
+    ]
+    annotations = [
+        {
+            "iscrowd": 0,
+            "image_id": image_id,
+            "category_id": category_id,
+            "id": 2 * image_id + category_id,
+            "bbox": [1, 2, 3, 4],
+            "area": 12,
+        }
+        for image_id in (0, 2)
+        for category_id in (0, 1)
+    ]
+    return {
+        "type": "instances",
+        "images": images,
+        "categories": {"0": "cat", "1": "dog"},
+        "annotations": annotations,
+    }
+
+
+def test_written_file_matches_json_dump(tmpdir):
+    coco_json = _coco_json()
+    path = str(tmpdir.join("output.json"))
+    with open(path, "w") as f:
+        write_coco_json(f, coco_json)
+
+    with open(path, "r") as f:
+        assert f.read() == json.dumps(coco_json)
+
+
+def test_index_lookups(tmpdir):
+    coco_json = _coco_json()
+    path = str(tmpdir.join("output.json"))
+    with open(path, "w") as f:
+        write_coco_json(f, coco_json, path + INDEX_SUFFIX)
+
+    with CocoIndexReader(path) as reader:
+        assert reader.image_ids == [0, 1, 2]
+        assert reader.get_image(2) == coco_json["images"][2]
+        assert reader.get_annotations(2) == coco_json["annotations"][2:]
+        assert reader.get_annotations(1) == []
+        assert reader.get_image_ids(1) == [0, 2]
@@ -0,0 +1,58 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+
+import gzip
+import io
+import json
+
+import pytest
+
+from gt_converter.compression import (
+    decompress_stream,
+    infer_compression,
+    open_input,
+    open_output,
+)
+
+
+def test_infer_compression():
+    assert infer_compression("s3://bucket/output.manifest.gz") == "gzip"
+    assert infer_compression("output.json.ZST") == "zstd"
+    assert infer_compression("output.json") is None
+    assert infer_compression("output.json", "gzip") == "gzip"
+    with pytest.raises(ValueError):
+        infer_compression("output.json", "bz2")
+
+
+@pytest.mark.parametrize("extension", [".gz", ".zst"])
+def test_roundtrip(tmpdir, extension):
+    """
+    Lines written through the background compressor are read back unchanged
+    """
+    if extension == ".zst":
+        pytest.importorskip("zstandard")
+    path = str(tmpdir.join("output.manifest" + extension))
+    lines = [{"source-ref": "s3://bucket/img{}.png".format(i)} for i in range(5000)]
+
+    with open_output(path) as f:
+        for line in lines:
+            f.write(json.dumps(line) + "\n")
+
+    with open_input(path) as f:
+        assert [json.loads(line) for line in f] == lines
+
+
+def test_decompress_stream():
+    data = b'{"tracking-annotations": []}'
+    stream = decompress_stream(io.BytesIO(gzip.compress(data)), "gzip")
+    assert stream.read() == data
@@ -0,0 +1,90 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+
+import io
+import json
+
+import pytest
+
+from gt_converter.json_stream import iter_json_array, prefetch_chunks
+
+
+def _chunked(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def test_tracking_annotations_are_streamed():
+    """
+    Frames are yielded in order regardless of how the document is split into chunks
+    """
+    frames = [
+        {
+            "frame-no": i,
+            "frame": "frame_{}.jpg".format(i),
+            "annotations": [{"object-name": "person:{}".format(i), "left": 1.5 * i}],
+        }
+        for i in range(50)
+    ]
+    document = json.dumps(
+        {"version": 12345, "tracking-annotations": frames, "trailer": "ünïcode"},
+        indent=2,
+    ).encode("utf-8")
+
+    for size in (1, 7, 64, len(document)):
+        assert (
+            list(iter_json_array(_chunked(document, size), "tracking-annotations"))
+            == frames
+        )
+
+
+def test_numbers_split_at_chunk_boundary():
+    """
+    Scalars split right after "." or "e" are not accepted as their prefix
+    """
+    document = b'{"version": 1.5, "tracking-annotations": [10e3, -2.5E-1, 7]}'
+    for split in range(1, len(document)):
+        chunks = [document[:split], document[split:]]
+        assert list(iter_json_array(chunks, "tracking-annotations")) == [
+            10e3,
+            -0.25,
+            7,
+        ]
+
+
+def test_empty_and_missing_array():
+    assert (
+        list(
+            iter_json_array([b'{"tracking-annotations": [ ]}'], "tracking-annotations")
+        )
+        == []
+    )
+    with pytest.raises(KeyError):
+        list(iter_json_array([b'{"other": [1, 2]}'], "tracking-annotations"))
+
+
+def test_prefetch_chunks():
+    data = bytes(range(256)) * 100
+    assert b"".join(prefetch_chunks(io.BytesIO(data), chunk_size=1000)) == data
+
+
+def test_prefetch_chunks_early_exit():
+    """
+    Closing the generator early waits for the reader, so the file can be closed safely
+    """
+    fileobj = io.BytesIO(bytes(100000))
+    chunks = prefetch_chunks(fileobj, chunk_size=10, depth=2)
+    next(chunks)
+    chunks.close()
+    position = fileobj.tell()
+    fileobj.close()
+    assert position < 100000
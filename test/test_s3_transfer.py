@@ -0,0 +1,207 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+
+import hashlib
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from gt_converter.s3_transfer import AdaptiveConcurrencyLimiter, S3TransferManager
+
+
+class SlowDownError(Exception):
+    def __init__(self):
+        super().__init__("SlowDown")
+        self.response = {
+            "Error": {"Code": "SlowDown"},
+            "ResponseMetadata": {"HTTPStatusCode": 503},
+        }
+
+
+class PreconditionFailedError(Exception):
+    def __init__(self):
+        super().__init__("PreconditionFailed")
+        self.response = {
+            "Error": {"Code": "PreconditionFailed"},
+            "ResponseMetadata": {"HTTPStatusCode": 412},
+        }
+
+
+class LocalS3:
+    """
+    Local stand-in for an S3 client that throttles when too many requests are in flight.
+    """
+
+    def __init__(self, objects, throttle_above=None, latency=0.001):
+        self.objects = objects
+        self.throttle_above = throttle_above
+        self.latency = latency
+        self.requests = 0
+        self.throttled = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        with self._lock:
+            self.requests += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            throttle = self.throttle_above and self._in_flight > self.throttle_above
+            if throttle:
+                self.throttled += 1
+        try:
+            time.sleep(self.latency)
+            if throttle:
+                raise SlowDownError()
+
+            data = self.objects[Key]
+            etag = '"{}"'.format(hashlib.md5(data).hexdigest())
+            if IfMatch is not None and IfMatch != etag:
+                raise PreconditionFailedError()
+            if Range is None:
+                return {"Body": io.BytesIO(data), "ETag": etag}
+            start, end = (int(i) for i in Range[len("bytes=") :].split("-"))
+            end = min(end, len(data) - 1)
+            return {
+                "Body": io.BytesIO(data[start : end + 1]),
+                "ContentRange": "bytes {}-{}/{}".format(start, end, len(data)),
+                "ETag": etag,
+            }
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+def test_transfer_strategy_by_size():
+    """
+    Small objects take a single GET, large objects are split into ranged parts
+    """
+    objects = {"small": os.urandom(100), "large": os.urandom(10 * 1000 + 1)}
+    client = LocalS3(objects)
+    transfer = S3TransferManager(client, max_concurrency=4, part_size=1000)
+
+    assert transfer.download_bytes("bucket", "small") == objects["small"]
+    assert client.requests == 1
+
+    outfile = io.BytesIO()
+    transfer.download_fileobj("bucket", "large", outfile)
+    assert outfile.getvalue() == objects["large"]
+    assert client.requests == 1 + 11
+    assert client.max_in_flight <= 4
+
+
+def test_overwritten_object_is_not_spliced():
+    """
+    Parts must come from the same version of the object as the first GET
+    """
+    objects = {"large": os.urandom(5000)}
+    client = LocalS3(objects)
+    transfer = S3TransferManager(client, max_concurrency=2, part_size=1000)
+
+    parts = transfer.iter_object_parts("bucket", "large")
+    assert next(parts) == objects["large"][:1000]
+    objects["large"] = os.urandom(5000)
+    with pytest.raises(PreconditionFailedError):
+        list(parts)
+
+
+def test_latency_excludes_body_read():
+    """
+    The limiter sees time to first byte, so slow body reads of large parts don't shrink it
+    """
+
+    class SlowBody:
+        def read(self):
+            time.sleep(0.05)
+            return b"x"
+
+    class SlowBodyClient:
+        def get_object(self, **kwargs):
+            return {"Body": SlowBody(), "ContentRange": "bytes 0-0/1"}
+
+    transfer = S3TransferManager(SlowBodyClient(), max_concurrency=4)
+    transfer.download_bytes("bucket", "key")
+    assert transfer.limiter._latency < 0.05
+
+
+def test_early_exit_cancels_pending_downloads():
+    objects = {"mask{}.png".format(i): os.urandom(50) for i in range(100)}
+    client = LocalS3(objects, latency=0.01)
+
+    with S3TransferManager(client, max_concurrency=2) as transfer:
+        downloads = transfer.iter_download(
+            sorted(objects), lambda key: "s3://bucket/" + key
+        )
+        next(downloads)
+        downloads.close()
+
+    assert client.requests < 10
+
+
+def test_throttling_settles_near_server_capacity():
+    """
+    Downloads succeed under throttling and the concurrency limit oscillates around the number
+    of requests the server accepts, instead of collapsing to the minimum
+    """
+    throttle_above = 12
+    objects = {"mask{}.png".format(i): os.urandom(50) for i in range(400)}
+    client = LocalS3(objects, throttle_above=throttle_above, latency=0.005)
+    transfer = S3TransferManager(client, max_concurrency=16, sleep=lambda _: None)
+
+    downloads = []
+    limits = []
+    for key, data in transfer.iter_download(
+        sorted(objects), lambda key: "s3://bucket/" + key
+    ):
+        downloads.append((key, data))
+        limits.append(transfer.limiter.concurrency)
+
+    assert [key for key, _ in downloads] == sorted(objects)
+    assert all(data == objects[key] for key, data in downloads)
+    assert client.throttled > 0
+
+    settled = limits[100:]
+    assert min(settled) >= throttle_above // 3
+    assert 0.6 * throttle_above <= sum(settled) / len(settled) <= throttle_above + 2
+
+
+def test_limiter_adapts():
+    limiter = AdaptiveConcurrencyLimiter(max_concurrency=8)
+    for _ in range(3):
+        limiter.release(limiter.acquire(), throttled=True)
+    assert limiter.concurrency == 1
+
+    for _ in range(100):
+        limiter.release(limiter.acquire(), latency=0.01)
+    assert limiter.concurrency == 8
+
+    limiter.release(limiter.acquire(), latency=1.0)
+    assert limiter.concurrency < 8
+
+
+def test_limiter_decreases_once_per_burst():
+    """
+    Concurrent throttles of requests started in the same window halve the limit only once
+    """
+    limiter = AdaptiveConcurrencyLimiter(max_concurrency=16)
+    tokens = [limiter.acquire() for _ in range(16)]
+    for token in tokens:
+        limiter.release(token, throttled=True)
+    assert limiter.concurrency == 8
+
+    limiter.release(limiter.acquire(), throttled=True)
+    assert limiter.concurrency == 4
@@ -0,0 +1,78 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+
+import pytest
+
+from gt_converter.sampling import ManifestSampler
+
+
+def _manifest(num_lines):
+    # class "rare" only appears in every 100th line
+    return [
+        {
+            "id": i,
+            "class-map": {"common": 0, "rare": 1} if i % 100 == 0 else {"common": 0},
+        }
+        for i in range(num_lines)
+    ]
+
+
+def _classes(line):
+    return line["class-map"].keys()
+
+
+def test_fixed_count_sample():
+    lines = _manifest(1000)
+    sample = ManifestSampler(10, seed=0).sample(iter(lines))
+
+    assert len(sample) == 10
+    assert [line["id"] for line in sample] == sorted(line["id"] for line in sample)
+    assert sample == ManifestSampler(10, seed=0).sample(iter(lines))
+
+
+def test_fraction_sample():
+    sample = ManifestSampler(0.1, seed=0).sample(iter(_manifest(10000)))
+    assert 800 < len(sample) < 1200
+
+
+def test_stratified_sample():
+    """
+    Every class is represented, even one too rare to show up in a plain sample
+    """
+    sample = ManifestSampler(5, stratify=True, seed=0).sample(_manifest(1000), _classes)
+    assert sum("rare" in line["class-map"] for line in sample) == 5
+    assert len(sample) <= 10
+
+    sample = ManifestSampler(0.001, stratify=True, seed=0).sample(
+        _manifest(1000), _classes
+    )
+    assert any("rare" in line["class-map"] for line in sample)
+
+
+def test_stratified_sample_keeps_lines_without_classes():
+    """
+    Negative lines (no class at all) are sampled as their own stratum
+    """
+    lines = [{"id": i, "class-map": {} if i % 2 else {"common": 0}} for i in range(100)]
+    sample = ManifestSampler(3, stratify=True, seed=0).sample(lines, _classes)
+    assert sum(not line["class-map"] for line in sample) == 3
+    assert len(sample) == 6
+
+
+def test_invalid_sample_size():
+    with pytest.raises(ValueError):
+        ManifestSampler(0)
+    with pytest.raises(ValueError):
+        ManifestSampler(1.5)
+    with pytest.raises(ValueError):
+        ManifestSampler(10, stratify=True).sample(_manifest(10))
@@ -0,0 +1,108 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+
+import json
+
+from gt_converter.convert_coco import CocoConverter
+
+
+def _offline_tracking_converter():
+    """
+    Converter reading two in-memory sequences instead of a GT job
+    """
+    sequences = {
+        "seq1.json": [
+            {
+                "frame-no": frame_no,
+                "frame": "frame{}.jpg".format(frame_no),
+                "annotations": [
+                    {
+                        "object-id": object_id,
+                        "object-name": "Pedestrian:{}".format(i + 1),
+                        "class-id": 0,
+                        "left": frame_no,
+                        "top": 2,
+                        "width": 3,
+                        "height": 4,
+                    }
+                    for i, object_id in enumerate(["a1b2", "c3d4"][: frame_no + 1])
+                ],
+            }
+            for frame_no in range(3)
+        ],
+        "seq2.json": [
+            {
+                "frame-no": 0,
+                "frame": "frame0.jpg",
+                "annotations": [
+                    {
+                        "object-id": "e5f6",
+                        "object-name": "Car:1",
+                        "class-id": 1,
+                        "left": 5,
+                        "top": 6,
+                        "width": 7,
+                        "height": 8,
+                    }
+                ],
+            }
+        ],
+    }
+    converter = CocoConverter.__new__(CocoConverter)
+    converter.manifest_reader = lambda manifest_path: iter(
+        [{"job-ref": "seq1.json"}, {"job-ref": "seq2.json"}]
+    )
+    converter.tracking_manifest_reader = lambda seq_label_path: iter(
+        sequences[seq_label_path]
+    )
+    return converter
+
+
+def test_videotracking_tracks_output(tmpdir):
+    converter = _offline_tracking_converter()
+    output_path = str(tmpdir.join("tracks.json"))
+    converter._convert_video_tracking_manifest_tracks("manifest", "job", output_path)
+
+    with open(output_path, "r") as outfile:
+        output = json.load(outfile)
+
+    first, second = output["sequences"]
+    assert [image["id"] for image in first["images"]] == [0, 1, 2]
+    assert [image["id"] for image in second["images"]] == [0]
+    assert {track["id"]: track["frame_ids"] for track in first["tracks"]} == {
+        "a1b2": [0, 1, 2],
+        "c3d4": [1, 2],
+    }
+    for sequence in output["sequences"]:
+        for track in sequence["tracks"]:
+            assert len(track["frame_ids"]) == len(track["bboxes"])
+    assert output["categories"] == [
+        {"id": 0, "name": "Pedestrian"},
+        {"id": 1, "name": "Car"},
+    ]
+
+
+def test_videotracking_mot_output(tmpdir):
+    converter = _offline_tracking_converter()
+    converter._convert_video_tracking_manifest_mot("manifest", "job", str(tmpdir))
+
+    with open(str(tmpdir.join("sequence-1", "gt", "gt.txt")), "r") as outfile:
+        assert outfile.read().splitlines() == [
+            "1,1,0,2,3,4,1,1,1",
+            "2,1,1,2,3,4,1,1,1",
+            "2,2,1,2,3,4,1,1,1",
+            "3,1,2,2,3,4,1,1,1",
+            "3,2,2,2,3,4,1,1,1",
+        ]
+    with open(str(tmpdir.join("sequence-2", "gt", "gt.txt")), "r") as outfile:
+        assert outfile.read().splitlines() == ["1,1,5,6,7,8,1,2,1"]